@@ -1,26 +1,136 @@
 import argparse
 import csv
 import glob
-import itertools
 import json
 import logging
-import multiprocessing
 import os
+import pickle
+import re
+import threading
 import time
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import as_completed
 from functools import partial
 from typing import Dict, List, Optional, Tuple
 
-import pandas as pd
+import lxml.etree
+import lxml.html
 import requests
 import yaml
 from bs4 import BeautifulSoup
+from bs4 import SoupStrainer
+from requests.adapters import HTTPAdapter
+from selectolax.parser import HTMLParser
+from urllib3.util.retry import Retry
 
 logging.root.setLevel(logging.INFO)
 
 CONFIG = yaml.load(open("config.yml"), Loader=yaml.FullLoader)
 ALL_CATEGORIES = CONFIG["CATEGORY_URLS"]
-OLDEST_ARTICLE_DATE = datetime.strptime(CONFIG["OLDEST_ARTICLE_DATE"], '%Y-%m-%d')
+# kept as a YYYY-MM-DD string: iso dates order correctly under plain
+# string comparison, so no datetime needs to be built per article
+OLDEST_ARTICLE_DATE = CONFIG["OLDEST_ARTICLE_DATE"]
+
+# bound once here so hot parsing paths don't hash into CONFIG on every call
+PAGINATION_LIST_CLASS = CONFIG["PAGINATION_LIST_CLASS"]
+ARTICLE_COUNT_SPAN = CONFIG["ARTICLE_COUNT_SPAN"]
+HEADLINE_SPAN_CLASS_A = tuple(CONFIG["HEADLINE_SPAN_CLASS_A"])
+HEADLINE_SPAN_CLASS_B = tuple(CONFIG["HEADLINE_SPAN_CLASS_B"])
+ARTICLE_DATE_CLASS = CONFIG["ARTICLE_DATE_CLASS"]
+STORY_DIV_CLASS = CONFIG["STORY_DIV_CLASS"]
+TOPIC_LIST_CLASS = CONFIG["TOPIC_LIST_CLASS"]
+
+# css selectors for the listing-page queries; the multi-token class
+# strings become chained class selectors
+PAGINATION_LIST_SELECTOR = "ul." + ".".join(PAGINATION_LIST_CLASS.split()) + " li"
+ARTICLE_COUNT_SELECTOR = "span." + ".".join(ARTICLE_COUNT_SPAN.split())
+
+# only topic list items matter on the pages get_topics visits, so soup
+# building can skip everything else
+TOPIC_STRAINER = SoupStrainer("li", attrs={"class": TOPIC_LIST_CLASS})
+
+# one compiled xpath returns the article date, headline and story
+# paragraphs in a single traversal of an article tree, instead of a
+# separate find/find_all walk from the root per target
+_HEADLINE_H1_PREDICATE = " or ".join(f'@class="{cls}"' for cls in HEADLINE_SPAN_CLASS_A)
+_HEADLINE_STRONG_PREDICATE = " or ".join(f'@class="{cls}"' for cls in HEADLINE_SPAN_CLASS_B)
+ARTICLE_XPATH = lxml.etree.XPath(
+    f'(//time[@class="{ARTICLE_DATE_CLASS}"]/@datetime)[1] | '
+    f'(//h1[{_HEADLINE_H1_PREDICATE}] | //strong[{_HEADLINE_STRONG_PREDICATE}])[1] | '
+    f'//div[@class="{STORY_DIV_CLASS}"]/p'
+)
+
+# compiled once at import; accepts the same hrefs as the old per-anchor
+# checks: exactly two path segments, with a stub that is either all digits
+# or a known article stub whose slug ends in a digit
+_STUB_ALTERNATIVES = "|".join(map(re.escape, CONFIG["VALID_ARTICLE_URL_STUBS"]))
+VALID_URL_PATTERN = re.compile(
+    rf"^/+[^/]+/+(?:\d+|(?:{_STUB_ALTERNATIVES})(?:-[^/]*)?(?<=\d))/*$"
+)
+
+MAX_WORKERS = 8
+REQUEST_TIMEOUT = 15
+WRITE_BATCH_SIZE = 50
+PAGE_CACHE_SIZE = 512
+CSV_HEADERS = ["headline", "text", "category", "url"]
+
+# a single session reuses connections to bbc.com (keep-alive + pooling)
+# instead of opening a new TCP+TLS connection per request
+SESSION = requests.Session()
+SESSION.headers.update(
+    {"User-Agent": "Mozilla/5.0 (X11; Linux x86_64; rv:109.0) Gecko/20100101 Firefox/115.0"}
+)
+SESSION.mount(
+    "https://",
+    HTTPAdapter(
+        pool_connections=16,
+        pool_maxsize=32,
+        max_retries=Retry(
+            total=3, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504]
+        ),
+    ),
+)
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket used to pace outbound requests
+
+    One token is consumed per request and tokens refill at `rate` per second
+    up to `capacity`, so short bursts are allowed while the sustained request
+    rate stays polite
+    """
+    def __init__(self, rate: float = 1.0, capacity: int = 8):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> None:
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.capacity, self.tokens + (now - self.updated_at) * self.rate
+                )
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait_time = (1 - self.tokens) / self.rate
+            time.sleep(wait_time)
+
+
+RATE_LIMITER = TokenBucket()
+
+SCRAPED_URLS_FILE_NAME = "scraped_urls.pkl"
+_SCRAPED_URLS_LOCK = threading.Lock()
+
+# response bodies keyed by url; articles visited during topic discovery
+# are fetched again by write_articles, so cache hits save a full round-trip
+_PAGE_CACHE: Dict[str, bytes] = {}
+_PAGE_CACHE_LOCK = threading.Lock()
 
 
 def get_parser() -> argparse.ArgumentParser:
@@ -75,37 +185,99 @@ def get_parser() -> argparse.ArgumentParser:
     return parser
 
 
-def get_page_soup(url:str) -> BeautifulSoup:
+def get_page_content(url:str, throttle:bool = False) -> bytes:
+    """
+    Makes a request to a url and returns the raw response body
+
+    Bodies are memoized by url (up to PAGE_CACHE_SIZE pages) so a page
+    visited by both topic discovery and article scraping is fetched once;
+    the rate limiter is only consulted on cache misses
+
+    input:
+        :param url: input page url
+        :param throttle: if True, wait on the rate limiter before requesting
+    returns:
+        - page_content: raw bytes of the response body
+    """
+    with _PAGE_CACHE_LOCK:
+        if url in _PAGE_CACHE:
+            return _PAGE_CACHE[url]
+
+    if throttle:
+        RATE_LIMITER.acquire()
+
+    response = SESSION.get(url, timeout=REQUEST_TIMEOUT)
+    page_content = response.content
+
+    with _PAGE_CACHE_LOCK:
+        if len(_PAGE_CACHE) < PAGE_CACHE_SIZE:
+            _PAGE_CACHE[url] = page_content
+
+    return page_content
+
+
+def get_page_tree(url:str, throttle:bool = False) -> lxml.html.HtmlElement:
+    """
+    Makes a request to a url and parses the response into an lxml tree
+
+    input:
+        :param url: input page url
+        :param throttle: if True, wait on the rate limiter before requesting
+    returns:
+        - page_tree: parsed tree of the response html
+    """
+    page_tree = lxml.html.fromstring(get_page_content(url, throttle))
+
+    return page_tree
+
+
+def get_listing_tree(url:str, throttle:bool = False) -> HTMLParser:
+    """
+    Makes a request to a url and parses the response with selectolax
+
+    Listing pages only need anchor hrefs and pagination counts, which the
+    lexbor-backed parser selects much faster than bs4/lxml
+
+    input:
+        :param url: input page url
+        :param throttle: if True, wait on the rate limiter before requesting
+    returns:
+        - listing_tree: parsed tree of the response html
+    """
+    listing_tree = HTMLParser(get_page_content(url, throttle))
+
+    return listing_tree
+
+
+def get_page_soup(url:str, parse_only:Optional[SoupStrainer] = None) -> BeautifulSoup:
     """
     Makes a request to a url and creates a beautiful soup oject from the response html
 
     input:
         :param url: input page url
+        :param parse_only: optional strainer; when given, only matching tags
+          (and their descendants) are parsed into the tree
     returns:
         - page_soup: beautiful soup oject from the response html
     """
 
-    response = requests.get(url)
-    page_html = response.text
-    page_soup = BeautifulSoup(page_html, "html.parser")
+    # BBC serves utf-8, so decode explicitly rather than paying for bs4's
+    # python-level charset detection on every page
+    page_html = get_page_content(url).decode("utf-8", "replace")
+    page_soup = BeautifulSoup(page_html, "lxml", parse_only=parse_only)
 
     return page_soup
 
 
-def get_page_count(page_soup: BeautifulSoup) -> int:
-    pagination_list = page_soup.find_all(
-        "ul", attrs={"class": CONFIG["PAGINATION_LIST_CLASS"]}
-    )
+def get_page_count(page_tree: HTMLParser) -> int:
+    pagination_list = page_tree.css(PAGINATION_LIST_SELECTOR)
     if pagination_list:
-        total_page_count = int(pagination_list[0].find_all("li")[-1].text)
+        total_page_count = int(pagination_list[-1].text())
         return total_page_count
-    else:
-        pagination_list = page_soup.find_all(
-            "span", attrs={"class": CONFIG["ARTICLE_COUNT_SPAN"]}
-            )
-    
-    if pagination_list:
-        total_page_count = int(pagination_list[0].text)
+
+    article_count_span = page_tree.css(ARTICLE_COUNT_SELECTOR)
+    if article_count_span:
+        total_page_count = int(article_count_span[0].text())
         return total_page_count
 
     return 1
@@ -126,8 +298,10 @@ def get_urls(
     returns:
         - category_urls: list of all valid article urls on all the category pages
     """
-    page_soup = get_page_soup(category_url)
-    category_urls = get_valid_urls(page_soup)
+    # parse the first category page once; page count and article urls
+    # are both read off the same tree
+    page_tree = get_listing_tree(category_url, time_delay)
+    category_urls = get_valid_urls(page_tree)
     logging.info(f"{len(category_urls)} urls in page 1 gotten for {category}")
     # get total number of pages for given category
     # article_count_span = page_soup.find_all(
@@ -139,7 +313,7 @@ def get_urls(
 
     # if there are multiple pages, get valid urls from each page
     # else just get the articles on the first page
-    total_page_count = get_page_count(page_soup)
+    total_page_count = get_page_count(page_tree)
     logging.info(f"{total_page_count} page(s) found for {category}")
 
     if total_page_count > 1:
@@ -151,185 +325,197 @@ def get_urls(
         if articles_per_category > 0 and len(category_urls) >= articles_per_category:
             return category_urls
 
-        for count in range(1, total_page_count):
-            page_soup = get_page_soup(category_url + f"?page={count+1}")
-            page_urls = get_valid_urls(page_soup)
-            logging.info(f"{len(page_urls)} urls in page {count+1} gotten for {category}")
-            category_urls+=page_urls
-            
-            if articles_per_category > 0 and len(category_urls) >= articles_per_category:
-                break
+        page_urls_list = [
+            category_url + f"?page={count+1}" for count in range(1, total_page_count)
+        ]
+        fetch = partial(get_listing_tree, throttle=time_delay)
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+            for count, page_tree in enumerate(executor.map(fetch, page_urls_list), 2):
+                page_urls = get_valid_urls(page_tree)
+                logging.info(f"{len(page_urls)} urls in page {count} gotten for {category}")
+                category_urls+=page_urls
 
-            if time_delay: 
-                time.sleep(10)
+                if articles_per_category > 0 and len(category_urls) >= articles_per_category:
+                    break
 
     return category_urls
 
 
-def get_valid_urls(category_page:BeautifulSoup) -> List[str]:
+def get_valid_urls(page_tree:HTMLParser) -> List[str]:
     """
     Gets all valid urls from a category page
 
     input:
-        :param: url: category_page
+        :param: page_tree: parsed tree of a category page
     returns:
         - valid_urls: list of all valid article urls on a given category page
     """
-    all_urls = category_page.findAll("a")
-    valid_article_urls = []
-    for url in all_urls:
-        href: str = url.get("href")
-        # from a look at BBC pidgin's urls, they always begin with the following strings. 
-        # so we obtain valid article urls using these strings
-        # if (
-        #     href.startswith("/pidgin/tori") or href.startswith("/pidgin/world") or href.startswith("/pidgin/sport")
-        #     ) and href[-1].isdigit():
-            # story_url = "https://www.bbc.com" + href
-        try:
-            _, stub = list(filter(None, href.split("/")))
-        except Exception as err:
-            continue
-        
-        if stub.isdigit() or (stub.split("-")[0] in CONFIG["VALID_ARTICLE_URL_STUBS"] and stub[-1].isdigit()):
-        # if stub.startswith("tori") or \
-        #     stub.startswith("world") or \
-        #         stub.startswith("media") or \
-        #             stub.startswith("sport") and \
-        #                 stub[-1].isdigit():
-            story_url = "https://www.bbc.com" + href # if href.startswith("/pidgin") else href
-            # print(story_url)
-            # if "live" in story_url.split("/"):
-            #     continue
-
-            valid_article_urls.append(story_url)
-
-    return list(set(valid_article_urls))
+    # a dict deduplicates as urls arrive (keeping first-seen order) instead
+    # of re-hashing the whole list in list(set(...)) at the end
+    valid_article_urls: Dict[str, None] = {}
+    for anchor in page_tree.css("a[href]"):
+        href = anchor.attributes["href"]
+        # from a look at BBC pidgin's urls, article hrefs all fit one shape,
+        # so a single precompiled pattern match replaces the split/membership/
+        # isdigit branch chain per anchor
+        if href and VALID_URL_PATTERN.match(href):
+            valid_article_urls.setdefault("https://www.bbc.com" + href, None)
+
+    return list(valid_article_urls)
+
+
+def load_scraped_urls(file_path: str) -> set:
+    """
+    Loads the urls already written to the corpus by previous runs
+
+    input:
+        :param file_path: path of the persisted url set
+    returns:
+        - scraped_urls: set of urls to skip, empty on a first run
+    """
+    if os.path.exists(file_path):
+        with open(file_path, "rb") as url_file:
+            return pickle.load(url_file)
+    return set()
+
+
+def save_scraped_urls(scraped_urls: set, file_path: str) -> None:
+    """
+    Persists the set of scraped urls for the next run to skip
+    """
+    with open(file_path, "wb") as url_file:
+        pickle.dump(scraped_urls, url_file)
+
+
+# translation table covers every character substitution in one C pass
+# instead of a chain of str.replace scans over the name
+_TOPIC_NAME_TABLE = str.maketrans({"/": "_", "\\": "_"})
+
+
+def clean_topic_name(topic_text: str) -> str:
+    """
+    Normalizes a topic's display text into a config-style key name
+    """
+    return "_".join(topic_text.split()).upper().translate(_TOPIC_NAME_TABLE)
 
 
 def get_topics(homepage: str, known_topic_urls: List[str]) -> Dict[str, str]:
     """
     Meant to be used with the homepage to recover all sub-topics available
     """
-    page_soup = get_page_soup(homepage)
-    article_urls = get_valid_urls(page_soup)
+    page_tree = get_listing_tree(homepage)
+    article_urls = get_valid_urls(page_tree)
     topics = {}
 
     for url in article_urls:
-        url_soup = get_page_soup(url)
-        topic_elements = url_soup.find_all("li", attrs={"class": CONFIG["TOPIC_LIST_CLASS"]}) or []
+        url_soup = get_page_soup(url, parse_only=TOPIC_STRAINER)
+        topic_elements = url_soup.find_all("li", attrs={"class": TOPIC_LIST_CLASS}) or []
         for topic in topic_elements:
             topic_url = "https://www.bbc.com" + topic.find("a").get("href")
             if topic_url not in known_topic_urls:
-                topic_name = "_".join(topic.text.split()).upper().replace("/", "_").replace("\\", "_")
+                topic_name = clean_topic_name(topic.text)
                 topics[topic_name] = topic_url
     return topics
 
 
-def get_headline(page_soup: BeautifulSoup) -> str:
-    for cls in CONFIG["HEADLINE_SPAN_CLASS_A"]:
-        headline_elem = page_soup.find(
-            "h1", attrs={"class": cls}
-        )
-        if headline_elem:
-            break
-    
-    if not headline_elem:
-        for cls in CONFIG["HEADLINE_SPAN_CLASS_B"]:
-            headline_elem = page_soup.find(
-                "strong", attrs={"class": CONFIG["HEADLINE_SPAN_CLASS_B"]}
-            )
-            if headline_elem:
-                break
-    
-    return headline_elem.text.strip() if headline_elem else ""
-
-
-def get_article_data(article_url:str) -> Tuple[Optional[str], Optional[str], str]:
+def get_article_data(article_url:str, throttle:bool = False) -> Tuple[Optional[str], Optional[str], str]:
     """
     Obtains paragraphs texts and headlines input url article
 
     input:
         :param article_url: category_page
+        :param throttle: if True, wait on the rate limiter before requesting
     returns:
-        - headline: headline of url article 
+        - headline: headline of url article
         - story_text: text of url article
         - article_url: input article url
     """
-    page_soup = get_page_soup(article_url)
-    article_date = page_soup.find("time", attrs={"class": CONFIG["ARTICLE_DATE_CLASS"]})
-
-    if article_date:
-        article_date = article_date.get("datetime")
-        article_date = datetime.strptime(article_date, '%Y-%m-%d')
-        if article_date <= OLDEST_ARTICLE_DATE:
-            return ("","",article_url)
-    
-    headline = get_headline(page_soup)
-    # headline = page_soup.find(
-    #     "h1", attrs={"class": CONFIG["HEADLINE_SPAN_CLASS_A"]}
-    #     )
-    # # by inspection, if the headline is not in the class above, it should be in the one below
-    # # TODO: Investigate if this is still necessary
-    # if not headline:
-    #     headline = page_soup.find(
-    #         "strong", attrs={"class": CONFIG["HEADLINE_SPAN_CLASS_B"]}
-    #         )
-    
-    # if headline:
-    #     headline = headline.text.strip()
-    
-    story_text = " "
-    story_div = page_soup.find_all(
-        "div", attrs={"class": CONFIG["STORY_DIV_CLASS"]}
-        )
-    if story_div:
-        all_paragraphs = [div.findAll("p", recursive=False) for div in story_div]
-        all_paragraphs = list(itertools.chain(*all_paragraphs))
-        story_text = story_text.join(str(paragraph) for paragraph in all_paragraphs)
-        story_text = BeautifulSoup(story_text, "html.parser").get_text()
-    story_text = story_text if not story_text == " " else None
+    page_tree = get_page_tree(article_url, throttle)
+
+    # one traversal collects all three targets; nodes are classified by
+    # what came back (the datetime attribute is the only string result)
+    article_date = None
+    headline = ""
+    story_paragraphs = []
+    for node in ARTICLE_XPATH(page_tree):
+        if isinstance(node, str):
+            article_date = node
+        elif node.tag == "p":
+            story_paragraphs.append(node)
+        else:
+            headline = node.text_content().strip()
+
+    if article_date and article_date[:10] <= OLDEST_ARTICLE_DATE:
+        return ("","",article_url)
+
+    paragraph_texts = [
+        " ".join(paragraph.text_content().split()) for paragraph in story_paragraphs
+    ]
+    story_text = " ".join(filter(None, paragraph_texts)) or None
 
     return (headline, story_text, article_url)
 
 
-def write_articles(category, output_file_name, urls, no_of_articles, time_delay):
+def write_articles(category, output_file_name, urls, no_of_articles, time_delay, scraped_urls):
     path = output_file_name.split("/")
     output_file_name = os.path.join(path[0], f"{category}_{path[1]}")
-    with open(output_file_name, "w") as csv_file:
-        headers = ["headline", "text", "category", "url"]
+
+    # urls already in the corpus from previous runs cost nothing to skip
+    new_urls = [url for url in urls if url not in scraped_urls]
+    if len(new_urls) < len(urls):
+        logging.info(
+            f"Skipping {len(urls) - len(new_urls)} already scraped urls for {category}"
+        )
+    urls = new_urls
+    with open(output_file_name, "w", buffering=1 << 20) as csv_file:
+        headers = CSV_HEADERS
         writer = csv.DictWriter(csv_file, delimiter="\t", fieldnames = headers)
         writer.writeheader()
         story_num = 0
+        # rows are buffered and written in batches so scraping threads are
+        # not serialized behind a syscall per article
+        pending_rows = []
 
         logging.info(f"Writing articles for {category} category...")
-        for url in urls:
-            headline, paragraphs, url = get_article_data(url)
-            if paragraphs:
-                writer.writerow({
-                    headers[0]:headline, 
-                    headers[1]:paragraphs, 
-                    headers[2]:category, 
-                    headers[3]:url,
-                    })
-                story_num+=1
-                logging.info(f"Successfully wrote story number {story_num}")
-
-            if story_num == no_of_articles:
-                logging.info(
-                    f"Requested total number of articles {no_of_articles} reached"
-                    )
-                logging.info(
-                    f"Scraping done. A total of {no_of_articles} articles were scraped!"
-                    )
-                return
-            if time_delay: 
-                time.sleep(10)
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+            futures = [
+                executor.submit(get_article_data, url, time_delay) for url in urls
+            ]
+            for future in as_completed(futures):
+                headline, paragraphs, url = future.result()
+                if paragraphs:
+                    pending_rows.append({
+                        headers[0]:headline,
+                        headers[1]:paragraphs,
+                        headers[2]:category,
+                        headers[3]:url,
+                        })
+                    story_num+=1
+                    with _SCRAPED_URLS_LOCK:
+                        scraped_urls.add(url)
+                    logging.info(f"Successfully wrote story number {story_num}")
+                    if len(pending_rows) >= WRITE_BATCH_SIZE:
+                        writer.writerows(pending_rows)
+                        pending_rows.clear()
+
+                if story_num == no_of_articles:
+                    for pending in futures:
+                        pending.cancel()
+                    writer.writerows(pending_rows)
+                    logging.info(
+                        f"Requested total number of articles {no_of_articles} reached"
+                        )
+                    logging.info(
+                        f"Scraping done. A total of {no_of_articles} articles were scraped!"
+                        )
+                    return
+        writer.writerows(pending_rows)
         logging.info(
         f"Scraping done. A total of {story_num} articles were scraped!"
         )
 
 
-def scrape(url, category, time_delay, articles_per_category, output_file_name):
+def scrape(url, category, time_delay, articles_per_category, output_file_name, scraped_urls):
     """
     Main function for scraping and writing articles to file
 
@@ -346,11 +532,12 @@ def scrape(url, category, time_delay, articles_per_category, output_file_name):
     logging.info(f"{len(category_story_links)} stories found for {category} category")
 
     write_articles(
-        category, 
-        output_file_name, 
+        category,
+        output_file_name,
         category_story_links,
         articles_per_category,
-        time_delay
+        time_delay,
+        scraped_urls
     )
 
 if __name__ == "__main__":
@@ -382,29 +569,51 @@ if __name__ == "__main__":
             articles_per_category = params.no_of_articles // len(categories)
         logging.info(f"Will collect at least {articles_per_category} stories per category")
     
-    pool = multiprocessing.Pool()
-    processes = [
-        pool.apply_async(
-            scrape,
-            args=(
+    scraped_urls_path = os.path.join(
+        params.output_file_name.split("/")[0], SCRAPED_URLS_FILE_NAME
+    )
+    scraped_urls = load_scraped_urls(scraped_urls_path)
+    if scraped_urls:
+        logging.info(f"{len(scraped_urls)} urls already scraped by previous runs")
+
+    # categories are I/O-bound so threads in one process are enough;
+    # they also share the session's connection pool and rate limiter
+    with ThreadPoolExecutor(max_workers=len(categories)) as executor:
+        futures = [
+            executor.submit(
+                scrape,
                 url,
                 category,
                 params.time_delay,
                 articles_per_category,
-                params.output_file_name
-            )
-        ) for category, url in categories.items()
-    ]
-    result = [p.get() for p in processes]
+                params.output_file_name,
+                scraped_urls
+            ) for category, url in categories.items()
+        ]
+        # surface failures as soon as any category finishes rather than
+        # waiting on them in submission order
+        for future in as_completed(futures):
+            future.result()
+
+    save_scraped_urls(scraped_urls, scraped_urls_path)
 
     path = params.output_file_name.split("/")
     output_file_pattern = os.path.join(path[0], f"*_{path[1]}")
     category_file_names = glob.glob(output_file_pattern)
 
-    reader = partial(pd.read_csv, sep="\t")
-    all_dfs = map(reader, category_file_names)
-    corpora = pd.concat(all_dfs).drop_duplicates(subset="url", keep="last")
-    corpora.to_csv(params.output_file_name, sep="\t", index=False)
+    # merge the per-category files row by row; a set of seen urls is all
+    # dedup needs, instead of materializing every frame plus the
+    # concatenated corpus in pandas
+    seen_urls = set()
+    with open(params.output_file_name, "w", buffering=1 << 20) as corpus_file:
+        writer = csv.DictWriter(corpus_file, delimiter="\t", fieldnames=CSV_HEADERS)
+        writer.writeheader()
+        for file_name in category_file_names:
+            with open(file_name) as category_file:
+                for row in csv.DictReader(category_file, delimiter="\t"):
+                    if row["url"] not in seen_urls:
+                        writer.writerow(row)
+                        seen_urls.add(row["url"])
 
     if params.cleanup:
         for f in category_file_names: